@@ -3,11 +3,16 @@ SLS Certificate & Name Tent Generator — Flask Web App
 
 """
 
+import contextlib
 import csv
+import functools
+import gzip
 import io
+import itertools
 import os
 import re
-import tempfile
+import threading
+import traceback
 import zipfile
 
 import fitz
@@ -34,6 +39,48 @@ STAFF_PDF       = _find_template("Staff.pdf")
 PARTICIPANT_PDF = _find_template("Participant.pdf")
 TENT_PDF        = _find_template("SLS_Name_Tent.pdf")
 
+# Read each template once at import; every fill parses these cached bytes
+# instead of re-opening the file from disk.
+_TEMPLATE_BYTES = {
+    path: open(path, "rb").read()
+    for path in (STAFF_PDF, PARTICIPANT_PDF, TENT_PDF)
+    if os.path.exists(path)
+}
+
+
+def _read_template(template_path: str) -> PdfReader:
+    """Return a new PdfReader over the cached template bytes."""
+    data = _TEMPLATE_BYTES.get(template_path)
+    return PdfReader(io.BytesIO(data)) if data is not None else PdfReader(template_path)
+
+
+# Idle parsed readers per template, shared by every thread.
+_idle_readers = {}
+_idle_readers_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _template_reader(template_path: str):
+    """Check out a parsed PdfReader for `template_path`, returning it after.
+
+    A reader keeps every object it has parsed, so reusing one means each
+    entry only clones the template instead of re-parsing it.  Readers
+    resolve objects lazily from a shared stream and are not safe to use from
+    two threads at once, so each is held by one caller at a time.  They are
+    kept process-wide rather than per thread, so an idle reader is reused by
+    whichever gunicorn thread needs one next.
+    """
+    with _idle_readers_lock:
+        idle   = _idle_readers.setdefault(template_path, [])
+        reader = idle.pop() if idle else None
+    if reader is None:
+        reader = _read_template(template_path)
+    try:
+        yield reader
+    finally:
+        with _idle_readers_lock:
+            _idle_readers[template_path].append(reader)
+
 
 # ── Font loading ──────────────────────────────────────────────────────────────
 
@@ -91,17 +138,31 @@ def _check_templates():
 try:
     _templates_ok = _check_templates()
 except Exception as _e:
-    import traceback
     print(f"[SLS] Startup error: {_e}\n{traceback.format_exc()}", flush=True)
     _templates_ok = False
 
+# Templates are read into _TEMPLATE_BYTES once at import and never change
+# while running, so /generate checks this list instead of stat()ing each file
+# on every request.  /healthcheck still looks at the filesystem.
+_MISSING_TEMPLATES = [
+    label for label, path in [("Staff.pdf", STAFF_PDF),
+                              ("Participant.pdf", PARTICIPANT_PDF),
+                              ("SLS_Name_Tent.pdf", TENT_PDF)]
+    if path not in _TEMPLATE_BYTES
+]
+
 
 # ── PDF helpers ───────────────────────────────────────────────────────────────
 
+@functools.lru_cache(maxsize=None)
 def _get_font_widths(template_path: str, font_name: str):
-    """Return (first_char, widths_list) from AcroForm /DR, or (None, None)."""
+    """Return (first_char, widths) from AcroForm /DR, or (None, None).
+
+    Templates never change at runtime, so each (template, font) table is
+    parsed once per process rather than once per field per entry.
+    """
     try:
-        reader = PdfReader(template_path)
+        reader = _read_template(template_path)
         root   = reader.trailer["/Root"]
         acro   = root["/AcroForm"].get_object()
         dr     = acro.get("/DR", {})
@@ -114,11 +175,49 @@ def _get_font_widths(template_path: str, font_name: str):
         fc     = int(fobj.get("/FirstChar", 0))
         wlist  = fobj.get("/Widths")
         if not wlist: return None, None
-        return fc, [int(x) for x in wlist]
+        return fc, tuple(int(x) for x in wlist)
     except Exception:
         return None, None
 
 
+@functools.lru_cache(maxsize=None)
+def _template_fields(template_path: str):
+    """Return (has_ap, fields) describing a template's form widgets.
+
+    `has_ap` is True for templates with an AcroForm /DR and pre-built AP
+    streams (the certificates); `fields` maps each field name to a list of
+    (annot_index, rect, font_name, font_size), one per widget, from its
+    /Rect and /DA.  Other annotations (links, popups) are skipped.
+    None of this changes between entries, so it is parsed once per process.
+    """
+    reader = _read_template(template_path)
+    page   = reader.pages[0]
+    annots_raw = page.get("/Annots")
+    annots     = [
+        ref.get_object() if hasattr(ref, "get_object") else ref
+        for ref in (annots_raw.get_object() if hasattr(annots_raw, "get_object") else (annots_raw or []))
+    ]
+
+    root   = reader.trailer["/Root"]
+    has_ap = False
+    if "/AcroForm" in root and "/DR" in root["/AcroForm"].get_object():
+        has_ap = any(annot.get("/AP") is not None for annot in annots)
+
+    fields = {}
+    for i, annot in enumerate(annots):
+        if annot.get("/Subtype") != "/Widget" or annot.get("/Rect") is None:
+            continue
+        da = str(annot.get("/DA", ""))
+        fm = re.search(r"/([A-Za-z0-9_-]+)\s+([\d.]+)\s+Tf", da)
+        fields.setdefault(str(annot.get("/T", "")), []).append((
+            i,
+            tuple(float(x) for x in annot.get("/Rect")),
+            fm.group(1) if fm else "Helv",
+            float(fm.group(2)) if fm else 12.0,
+        ))
+    return has_ap, fields
+
+
 def _fit_text(text: str, nominal_size: float,
               fc, widths, rect_width: float,
               min_size: float = 14.0):
@@ -158,20 +257,25 @@ def _patch_ap_stream(stream: bytes, new_text: str, rect_width: float,
         return stream
     orig_y = m.group(2).decode()
 
+    # The "/<font> <size> Tf" that sets up this text precedes the Td/Tj.
+    # Look for it only there, and check its shape before touching it; any
+    # whitespace may separate the operands and the operator.
+    tf = stream.rfind(b"Tf", 0, m.start())
+    size = re.search(rb"/[^\s/]+\s+([\d.]+)\s+$", stream[:tf]) \
+        if tf != -1 and stream[tf + 2 : tf + 3].isspace() else None
+    if size is None:
+        # No size to rewrite: still replace the text, centred at the
+        # nominal size it will be drawn with.
+        _, x_offset = _fit_text(new_text, font_size, fc, widths, rect_width,
+                                min_size=font_size)
+        replacement = f"{x_offset:.3f} {orig_y} Td\n({new_text}) Tj".encode()
+        return stream[: m.start()] + replacement + stream[m.end() :]
+
     new_size, x_offset = _fit_text(new_text, font_size, fc, widths, rect_width)
 
-    # Update Tf font size
-    stream = re.sub(
-        rb"(/[A-Za-z0-9_-]+) [\d.]+ Tf",
-        lambda mo: mo.group(1) + f" {new_size:.1f} Tf".encode(),
-        stream, count=1,
-    )
-    # Re-find Td after substitution (byte offsets shifted)
-    m2 = re.search(rb"([\d.]+) ([\d.]+) Td\n\(([^)]*)\) Tj", stream)
-    if not m2:
-        return stream
-    replacement = f"{x_offset:.3f} {m2.group(2).decode()} Td\n({new_text}) Tj".encode()
-    return stream[: m2.start()] + replacement + stream[m2.end() :]
+    replacement = f"{x_offset:.3f} {orig_y} Td\n({new_text}) Tj".encode()
+    return (stream[: size.start(1)] + f"{new_size:.1f}".encode()
+            + stream[size.end(1) : m.start()] + replacement + stream[m.end() :])
 
 
 
@@ -211,83 +315,165 @@ def _inject_helv_resource(pdf_path: str) -> None:
     os.replace(tmp.name, pdf_path)
 
 
-def _merge_ap_into_page(filled_path: str, output_path: str, *,
-                        fonts: dict, template_path: str | None) -> None:
-    """Merge annotation AP streams into page content, embed font data, flatten."""
+@functools.lru_cache(maxsize=None)
+def _font_file_stream(font_bytes: bytes):
+    """Return a Flate-encoded /FontFile3 stream for an OpenType font.
+
+    The same few Museo fonts are embedded in every output, so the encoded
+    stream is memoized per font.  It is shared by every thread and never
+    added to a writer itself: each writer adds its own clone.
+    """
+    from pypdf.generic import DecodedStreamObject, NameObject
+
+    ff = DecodedStreamObject()
+    ff.set_data(font_bytes)
+    ff[NameObject("/Subtype")] = NameObject("/OpenType")
+    return ff.flate_encode()
+
+
+def _clone_dr_fonts(reader: PdfReader, writer: PdfWriter):
+    """Return the template's AcroForm /DR /Font dict cloned into `writer`.
+
+    Pages must only reference the writer's own objects, never the cached
+    reader's.  Returns None if the template has no AcroForm.
+    """
+    from pypdf.generic import DictionaryObject
+
+    root = reader.trailer["/Root"]
+    if "/AcroForm" not in root:
+        return None
+    acro     = root["/AcroForm"].get_object()
+    dr       = acro.get("/DR", {})
+    if hasattr(dr, "get_object"):      dr       = dr.get_object()
+    dr_fonts = dr.get("/Font", {})
+    if hasattr(dr_fonts, "get_object"): dr_fonts = dr_fonts.get_object()
+    return dr_fonts.clone(writer) if isinstance(dr_fonts, DictionaryObject) \
+           else DictionaryObject()
+
+
+def _add_template_page(writer: PdfWriter, reader: PdfReader) -> None:
+    """Append the template's page to `writer` with its own set of widgets.
+
+    Everything else on the page (content streams, images, resources, fonts)
+    goes through pypdf's clone map, so it is copied into the writer once
+    and shared by every page filled from the same reader.  Only what a fill
+    rewrites gets a fresh copy per entry: each annotation dict, its /AP dict
+    and the /AP /N stream.
+    """
+    from pypdf.generic import (
+        ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, StreamObject,
+    )
+
+    def clone(v):
+        return v.clone(writer) if hasattr(v, "clone") else v
+
+    src  = reader.pages[0]
+    # add_page makes a new page dict each time but reuses the objects below
+    # it that were already cloned from this reader.
+    page = writer.add_page(src, excluded_keys=("/Annots",))
+
+    annots_raw = src.get("/Annots")
+    annots     = ArrayObject()
+    for ref in (annots_raw.get_object() if hasattr(annots_raw, "get_object") else (annots_raw or [])):
+        annot = ref.get_object() if hasattr(ref, "get_object") else ref
+        dup   = DictionaryObject()
+        for k, v in annot.items():
+            # /P and /Parent point back at the template's page and form.
+            if k not in ("/P", "/Parent", "/AP"):
+                dup[NameObject(k)] = clone(v)
+        ap = annot.get("/AP")
+        if ap is not None:
+            ap     = ap.get_object() if hasattr(ap, "get_object") else ap
+            ap_dup = DictionaryObject()
+            for k, v in ap.items():
+                n = v.get_object() if hasattr(v, "get_object") else v
+                if k == "/N" and isinstance(n, StreamObject):
+                    n_dup = DecodedStreamObject()
+                    for nk, nv in n.items():
+                        if nk not in ("/Filter", "/DecodeParms", "/Length"):
+                            n_dup[NameObject(nk)] = clone(nv)
+                    n_dup.set_data(n.get_data())
+                    ap_dup[NameObject(k)] = writer._add_object(n_dup)
+                else:
+                    ap_dup[NameObject(k)] = clone(v)
+            dup[NameObject("/AP")] = ap_dup
+        annots.append(writer._add_object(dup))
+    page[NameObject("/Annots")] = annots
+
+
+def _merge_ap_into_page(writer: PdfWriter, *, fonts: dict,
+                        template_path: str, shared: dict) -> None:
+    """Merge annotation AP streams into page content, embed font data, flatten.
+
+    Works in place on the last (just filled) page of `writer`.  Font objects
+    are built once per writer and kept in `shared` (see fill_and_flatten).
+    """
     from pypdf.generic import (
         ArrayObject, NameObject, DecodedStreamObject, DictionaryObject, NumberObject
     )
 
-    reader2 = PdfReader(filled_path)
-    writer2 = PdfWriter()
-    writer2.append(reader2)
-    page = writer2.pages[0]
+    page      = writer.pages[-1]
+    font_refs = shared.setdefault("fonts", {})
+
+    def font_file(font_key):
+        if font_key not in font_refs:
+            font_refs[font_key] = writer._add_object(_font_file_stream(fonts[font_key]).clone(writer))
+        return font_refs[font_key]
+
+    page_res   = page.get("/Resources", DictionaryObject())
+    if hasattr(page_res, "get_object"):   page_res   = page_res.get_object()
+    page_fonts = page_res.get("/Font", DictionaryObject())
+    if hasattr(page_fonts, "get_object"): page_fonts = page_fonts.get_object()
 
     # Copy AcroForm /DR font entries into page /Resources /Font so that the
     # merged AP content (which uses e.g. /MuseoSlab-700) can resolve the name.
     # When font file bytes are available in `fonts`, embed them so the PDF is
     # self-contained (required for Preview / offline viewing).
-    if template_path:
-        orig = PdfReader(template_path)
-        root = orig.trailer["/Root"]
-        if "/AcroForm" in root:
-            acro     = root["/AcroForm"].get_object()
-            dr       = acro.get("/DR", {})
-            if hasattr(dr, "get_object"):      dr       = dr.get_object()
-            dr_fonts = dr.get("/Font", {})
-            if hasattr(dr_fonts, "get_object"): dr_fonts = dr_fonts.get_object()
-
-            page_res   = page.get("/Resources", DictionaryObject())
-            if hasattr(page_res, "get_object"):   page_res   = page_res.get_object()
-            page_fonts = page_res.get("/Font", DictionaryObject())
-            if hasattr(page_fonts, "get_object"): page_fonts = page_fonts.get_object()
-
-            for fname, fref in (dr_fonts.items() if hasattr(dr_fonts, "items") else []):
-                pname = fname.lstrip("/")
-                if pname in fonts:
-                    # Build a font dict that references an embedded font stream.
-                    f_obj  = fref.get_object() if hasattr(fref, "get_object") else fref
-                    ff     = DecodedStreamObject()
-                    ff.set_data(fonts[pname])
-                    ff[NameObject("/Subtype")] = NameObject("/OpenType")
-                    ff_ref = writer2._add_object(ff)
-                    new_fd = DictionaryObject()
-                    orig_fd = f_obj.get("/FontDescriptor")
-                    if orig_fd:
-                        for k, v in (orig_fd.get_object() if hasattr(orig_fd, "get_object") else orig_fd).items():
-                            new_fd[NameObject(k)] = v
-                    new_fd[NameObject("/FontFile3")] = ff_ref
-                    new_font = DictionaryObject()
-                    for k, v in f_obj.items():
-                        if k != "/FontDescriptor":
-                            new_font[NameObject(k)] = v
-                    new_font[NameObject("/FontDescriptor")] = writer2._add_object(new_fd)
-                    page_fonts[NameObject(fname)] = writer2._add_object(new_font)
-                elif fname not in page_fonts:
-                    page_fonts[NameObject(fname)] = fref
-
-            page_res[NameObject("/Font")]    = page_fonts
-            page[NameObject("/Resources")] = page_res
+    dr_fonts = shared.get("dr_fonts", {}).get(template_path)
+    for fname, fref in (dr_fonts.items() if dr_fonts is not None else []):
+        pname = fname.lstrip("/")
+        if pname in fonts:
+            # Build a font dict that references an embedded font stream.
+            key = (template_path, fname)
+            if key not in font_refs:
+                f_obj  = fref.get_object() if hasattr(fref, "get_object") else fref
+                new_fd = DictionaryObject()
+                orig_fd = f_obj.get("/FontDescriptor")
+                if orig_fd:
+                    for k, v in (orig_fd.get_object() if hasattr(orig_fd, "get_object") else orig_fd).items():
+                        new_fd[NameObject(k)] = v
+                new_fd[NameObject("/FontFile3")] = font_file(pname)
+                new_font = DictionaryObject()
+                for k, v in f_obj.items():
+                    if k != "/FontDescriptor":
+                        new_font[NameObject(k)] = v
+                new_font[NameObject("/FontDescriptor")] = writer._add_object(new_fd)
+                font_refs[key] = writer._add_object(new_font)
+            page_fonts[NameObject(fname)] = font_refs[key]
+        elif fname not in page_fonts:
+            page_fonts[NameObject(fname)] = fref
 
     # Also register any fonts present in FONTS but missing from DR
     # (e.g. MuseoSans-700 is used in DA but absent from the template's /DR)
-    for font_key, font_bytes in fonts.items():
+    for font_key in fonts:
         slash_key = f"/{font_key}"
         if slash_key not in page_fonts:
-            ff = DecodedStreamObject()
-            ff.set_data(font_bytes)
-            ff[NameObject("/Subtype")] = NameObject("/OpenType")
-            ff_ref = writer2._add_object(ff)
-            fd = DictionaryObject()
-            fd[NameObject("/FontName")] = NameObject(f"/{font_key}")
-            fd[NameObject("/Flags")] = NumberObject(32)
-            fd[NameObject("/FontFile3")] = ff_ref
-            new_font = DictionaryObject()
-            new_font[NameObject("/Type")] = NameObject("/Font")
-            new_font[NameObject("/Subtype")] = NameObject("/Type1")
-            new_font[NameObject("/BaseFont")] = NameObject(f"/{font_key}")
-            new_font[NameObject("/FontDescriptor")] = writer2._add_object(fd)
-            page_fonts[NameObject(slash_key)] = writer2._add_object(new_font)
+            key = (None, slash_key)
+            if key not in font_refs:
+                fd = DictionaryObject()
+                fd[NameObject("/FontName")] = NameObject(f"/{font_key}")
+                fd[NameObject("/Flags")] = NumberObject(32)
+                fd[NameObject("/FontFile3")] = font_file(font_key)
+                new_font = DictionaryObject()
+                new_font[NameObject("/Type")] = NameObject("/Font")
+                new_font[NameObject("/Subtype")] = NameObject("/Type1")
+                new_font[NameObject("/BaseFont")] = NameObject(f"/{font_key}")
+                new_font[NameObject("/FontDescriptor")] = writer._add_object(fd)
+                font_refs[key] = writer._add_object(new_font)
+            page_fonts[NameObject(slash_key)] = font_refs[key]
+
+    page_res[NameObject("/Font")]  = page_fonts
+    page[NameObject("/Resources")] = page_res
 
     # Stamp each annotation's /AP /N stream into the page content stream.
     ap_parts   = []
@@ -312,32 +498,36 @@ def _merge_ap_into_page(filled_path: str, output_path: str, *,
             pass
 
     if ap_parts:
+        # Append the stamps as an extra content stream rather than decoding
+        # and re-joining the template's own streams: those stay byte-for-byte
+        # (still compressed, and shared across pages once merged) and only
+        # the small stamp stream is new per entry.
         contents = page.get("/Contents")
-        existing = []
+        existing = ArrayObject()
         if contents is not None:
             co = contents.get_object() if hasattr(contents, "get_object") else contents
             if isinstance(co, ArrayObject):
-                for s in co:
-                    so = s.get_object() if hasattr(s, "get_object") else s
-                    existing.append(so.get_data())
-            elif hasattr(co, "get_data"):
-                existing.append(co.get_data())
+                existing.extend(co)
+            else:
+                existing.append(contents)
         ns = DecodedStreamObject()
-        ns.set_data(b"\n".join(existing + ap_parts))
-        page[NameObject("/Contents")] = writer2._add_object(ns)
+        ns.set_data(b"\n" + b"\n".join(ap_parts))
+        existing.append(writer._add_object(ns.flate_encode()))
+        page[NameObject("/Contents")] = existing
 
     page[NameObject("/Annots")] = ArrayObject()
-    if "/AcroForm" in writer2._root_object:
-        del writer2._root_object["/AcroForm"]
-
-    with open(output_path, "wb") as f:
-        writer2.write(f)
-    os.unlink(filled_path)
 
 
-def fill_and_flatten(template_path, field_values, output_path):
+def fill_and_flatten(template_path, field_values, writer=None,
+                     reader=None, shared=None) -> PdfWriter:
     """Fill PDF form fields and flatten to static, uneditable content.
 
+    Appends the flattened page to `writer` (a new PdfWriter if omitted) and
+    returns the writer.  To build many pages into one writer, pass the same
+    template `reader` and `shared` dict for each: the template's page
+    objects, /DR fonts and embedded fonts are then copied into the writer
+    once and reused by every page.
+
     Strategy
     --------
     Cert templates (Staff.pdf, Participant.pdf) have an AcroForm with /DR and
@@ -356,22 +546,25 @@ def fill_and_flatten(template_path, field_values, output_path):
         DictionaryObject, create_string_object,
     )
 
-    reader = PdfReader(template_path)
-    writer = PdfWriter()
-    writer.append(reader)
-    page   = writer.pages[0]
-
-    # Detect whether this template has a proper AcroForm /DR (cert) or not (tent).
-    root = reader.trailer["/Root"]
-    has_dr = False
+    if writer is None:
+        writer = PdfWriter()
+    if shared is None:
+        shared = {}
+    with contextlib.ExitStack() as stack:
+        if reader is None:
+            reader = stack.enter_context(_template_reader(template_path))
+        dr_fonts = shared.setdefault("dr_fonts", {})
+        if template_path not in dr_fonts:
+            dr_fonts[template_path] = _clone_dr_fonts(reader, writer)
+        _add_template_page(writer, reader)
+    page   = writer.pages[-1]
+    annots = page["/Annots"]
+
+    # Whether this template has a proper AcroForm /DR (cert) or not (tent),
+    # and where each field's widget sits, come from the per-template cache:
+    # no annotation scan or /DA parsing per entry.
+    has_dr, fields = _template_fields(template_path)
     print(f"[SLS] fill_and_flatten: template={template_path}, has_dr={has_dr}", flush=True)
-    if "/AcroForm" in root and "/DR" in root["/AcroForm"].get_object():
-        annots_raw = page.get("/Annots")
-        annots = annots_raw.get_object() if hasattr(annots_raw, "get_object") else (annots_raw or [])
-        has_dr = any(
-            (ref.get_object() if hasattr(ref, "get_object") else ref).get("/AP") is not None
-            for ref in annots
-        )
 
     if not has_dr:
         # ── Tent path: fitz fills with Helv (tolerates missing /DR) ──────────
@@ -380,42 +573,33 @@ def fill_and_flatten(template_path, field_values, output_path):
         # strict viewers (macOS Preview).  We write a clean stream with the font
         # declared first, text properly centred, and /Helv registered in page
         # resources so the font reference resolves without system font lookup.
-        annots_raw = page.get("/Annots")
-        for ref in annots_raw.get_object() if hasattr(annots_raw, "get_object") else (annots_raw or []):
-            annot      = ref.get_object() if hasattr(ref, "get_object") else ref
-            field_name = str(annot.get("/T", ""))
-            if field_name not in field_values:
-                continue
-            rect      = [float(x) for x in annot.get("/Rect")]
-            rect_w    = rect[2] - rect[0]
-            rect_h    = rect[3] - rect[1]
-            da        = str(annot.get("/DA", ""))
-            fm        = re.search(r"/([A-Za-z0-9_-]+)\s+([\d.]+)\s+Tf", da)
-            i_font    = fm.group(1) if fm else "Helv"
-            font_size = float(fm.group(2)) if fm else 12.0
-            # Use Museo font if available (loaded on Render), else Helv
-            font_name = i_font if i_font in FONTS else "Helv"
-            print(f"[SLS] tent field '{field_name}': i_font={i_font}, in FONTS={i_font in FONTS}, font_name={font_name}, FONTS keys={list(FONTS.keys())}", flush=True)
-
-            text      = field_values[field_name]
-            em        = 0.52 if "Museo" in font_name else 0.55
-            text_w    = len(text) * font_size * em
-            avail     = rect_w - 4.0
-            x         = 2.0
-            y         = max(2.0, (rect_h - font_size) / 2.0)
-
-            ap_stream = (
-                f"q\n1 1 {rect_w-2:.3f} {rect_h-2:.3f} re W n\n"
-                f"BT\n/{font_name} {font_size:.1f} Tf\n0 g\n"
-                f"{x:.3f} {y:.3f} Td\n({text}) Tj\nET\nQ\n"
-            ).encode()
-
-            n_obj = DecodedStreamObject()
-            n_obj.set_data(ap_stream)
-            ap_d = DictionaryObject()
-            ap_d[NameObject("/N")] = writer._add_object(n_obj)
-            annot[NameObject("/AP")] = writer._add_object(ap_d)
-            annot[NameObject("/V")] = create_string_object(text)
+        for field_name, text in field_values.items():
+            for i, rect, i_font, font_size in fields.get(field_name, ()):
+                annot     = annots[i].get_object()
+                rect_w    = rect[2] - rect[0]
+                rect_h    = rect[3] - rect[1]
+                # Use Museo font if available (loaded on Render), else Helv
+                font_name = i_font if i_font in FONTS else "Helv"
+                print(f"[SLS] tent field '{field_name}': i_font={i_font}, in FONTS={i_font in FONTS}, font_name={font_name}, FONTS keys={list(FONTS.keys())}", flush=True)
+
+                em        = 0.52 if "Museo" in font_name else 0.55
+                text_w    = len(text) * font_size * em
+                avail     = rect_w - 4.0
+                x         = 2.0
+                y         = max(2.0, (rect_h - font_size) / 2.0)
+
+                ap_stream = (
+                    f"q\n1 1 {rect_w-2:.3f} {rect_h-2:.3f} re W n\n"
+                    f"BT\n/{font_name} {font_size:.1f} Tf\n0 g\n"
+                    f"{x:.3f} {y:.3f} Td\n({text}) Tj\nET\nQ\n"
+                ).encode()
+
+                n_obj = DecodedStreamObject()
+                n_obj.set_data(ap_stream)
+                ap_d = DictionaryObject()
+                ap_d[NameObject("/N")] = writer._add_object(n_obj)
+                annot[NameObject("/AP")] = writer._add_object(ap_d)
+                annot[NameObject("/V")] = create_string_object(text)
 
         # Register /Helv (or the Museo font) in page resources so it resolves
         page_res   = page.get("/Resources", DictionaryObject())
@@ -431,115 +615,124 @@ def fill_and_flatten(template_path, field_values, output_path):
             page_res[NameObject("/Font")]   = page_fonts
             page[NameObject("/Resources")]  = page_res
 
-        tmp1 = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
-        tmp1.close()
-        with open(tmp1.name, "wb") as f:
-            writer.write(f)
-        _merge_ap_into_page(tmp1.name, output_path, fonts=FONTS, template_path=TENT_PDF)
-        return
+        _merge_ap_into_page(writer, fonts=FONTS, template_path=template_path,
+                            shared=shared)
+        return writer
 
     # ── Cert path: patch existing AP streams directly ─────────────────────────
     # pypdf's update_page_form_field_values always regenerates AP left-aligned
     # (ignoring /Q=1).  Instead we patch the original AP in-place: replace the
     # text string and recalculate the centred x-offset, preserving everything else.
-    annots_raw = page.get("/Annots")
-    annots     = annots_raw.get_object() if hasattr(annots_raw, "get_object") else (annots_raw or [])
-    for ref in annots:
-        annot      = ref.get_object() if hasattr(ref, "get_object") else ref
-        field_name = str(annot.get("/T", ""))
-        if field_name not in field_values:
-            continue
-        ap = annot.get("/AP")
-        if not ap:
-            continue
-        n = (ap.get_object() if hasattr(ap, "get_object") else ap).get("/N")
-        if not n:
-            continue
-        n_obj = n.get_object() if hasattr(n, "get_object") else n
-        rect       = [float(x) for x in annot.get("/Rect")]
-        rect_width = rect[2] - rect[0]
-        da         = str(annot.get("/DA", ""))
-        fm         = re.search(r"/([A-Za-z0-9_-]+)\s+([\d.]+)\s+Tf", da)
-        font_name  = fm.group(1) if fm else "Helv"
-        font_size  = float(fm.group(2)) if fm else 12.0
-        fc, widths = _get_font_widths(template_path, font_name)
-        try:
-            new_stream = _patch_ap_stream(
-                n_obj.get_data(), field_values[field_name], rect_width, font_size,
-                fc=fc, widths=widths,
-            )
-            n_obj.set_data(new_stream)
-        except Exception as exc:
-            print(f"[SLS] AP patch error '{field_name}': {exc}", flush=True)
-        annot[NameObject("/V")] = create_string_object(field_values[field_name])
-
-    tmp1 = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
-    tmp1.close()
-    with open(tmp1.name, "wb") as f:
-        writer.write(f)
-    _merge_ap_into_page(tmp1.name, output_path, fonts=FONTS, template_path=template_path)
+    for field_name, text in field_values.items():
+        for i, rect, font_name, font_size in fields.get(field_name, ()):
+            annot = annots[i].get_object()
+            ap = annot.get("/AP")
+            if not ap:
+                continue
+            n = (ap.get_object() if hasattr(ap, "get_object") else ap).get("/N")
+            if not n:
+                continue
+            n_obj = n.get_object() if hasattr(n, "get_object") else n
+            rect_width = rect[2] - rect[0]
+            fc, widths = _get_font_widths(template_path, font_name)
+            try:
+                new_stream = _patch_ap_stream(
+                    n_obj.get_data(), text, rect_width, font_size,
+                    fc=fc, widths=widths,
+                )
+                n_obj.set_data(new_stream)
+            except Exception as exc:
+                print(f"[SLS] AP patch error '{field_name}': {exc}", flush=True)
+            annot[NameObject("/V")] = create_string_object(text)
+
+    _merge_ap_into_page(writer, fonts=FONTS, template_path=template_path,
+                        shared=shared)
+    return writer
 
 
-def build_merged_pdf(page_paths, output_path):
+def build_merged_pdf(tasks):
+    """Fill each (template, field_values) task and return one merged PDF as bytes.
+
+    Every page is filled straight into the merged writer, so each is built
+    once with no intermediate writer, save or re-parse.
+    """
     merged = PdfWriter()
-    for path in page_paths:
-        merged.append(PdfReader(path))
-    with open(output_path, "wb") as f:
-        merged.write(f)
-
-
-def generate_certificates(entries, section, output_path):
-    with tempfile.TemporaryDirectory() as tmpdir:
-        pages = []
-        for i, entry in enumerate(entries):
-            template = STAFF_PDF if entry["role"].lower() == "staff" \
-                       else PARTICIPANT_PDF
-            page_path = os.path.join(tmpdir, f"cert_{i:04d}.pdf")
-            fill_and_flatten(template,
-                             {"Name": entry["name"], "Section": section},
-                             page_path)
-            pages.append(page_path)
-        build_merged_pdf(pages, output_path)
-
-
-def generate_name_tents(entries, output_path):
-    with tempfile.TemporaryDirectory() as tmpdir:
-        pages = []
-        for i, entry in enumerate(entries):
-            name_value  = entry["name"]
-            lodge_value = entry["lodge"]
-            if entry["role"].lower() == "staff":
-                lodge_value = "STAFF - " + lodge_value
-            page_path = os.path.join(tmpdir, f"tent_{i:04d}.pdf")
-            fill_and_flatten(TENT_PDF,
-                             {"Name": name_value, "Lodge": lodge_value},
-                             page_path)
-            pages.append(page_path)
-        build_merged_pdf(pages, output_path)
+    # Hold one reader per template for the whole batch, so every page shares
+    # the template objects already cloned into `merged`.
+    shared = {}
+    with contextlib.ExitStack() as stack:
+        readers = {}
+        for template_path, field_values in tasks:
+            if template_path not in readers:
+                readers[template_path] = stack.enter_context(_template_reader(template_path))
+            fill_and_flatten(template_path, field_values, merged,
+                             readers[template_path], shared)
+    # Pages are copied without the template's form, but make sure the
+    # flattened output never advertises fields: one check per document.
+    merged._root_object.pop("/AcroForm", None)
+    # The pages already share the template objects.  One pass drops the
+    # flattened widgets, now unreferenced, and merges what the Staff and
+    # Participant templates have in common.
+    merged.compress_identical_objects()
+    buf = io.BytesIO()
+    merged.write(buf)
+    return buf.getvalue()
+
+
+def generate_certificates(entries, section):
+    tasks = []
+    for entry in entries:
+        template = STAFF_PDF if entry["is_staff"] else PARTICIPANT_PDF
+        tasks.append((template, {"Name": entry["name"], "Section": section}))
+    return build_merged_pdf(tasks)
+
+
+def generate_name_tents(entries):
+    tasks = []
+    for entry in entries:
+        name_value  = entry["name"]
+        lodge_value = entry["lodge"]
+        if entry["is_staff"]:
+            lodge_value = "STAFF - " + lodge_value
+        tasks.append((TENT_PDF, {"Name": name_value, "Lodge": lodge_value}))
+    return build_merged_pdf(tasks)
 
 
 # ── Parsing ───────────────────────────────────────────────────────────────────
 
-def parse_csv(text):
+def parse_csv(lines):
+    """Parse attendee rows from an iterable of CSV lines (e.g. a text file)."""
+    reader = csv.reader(lines)
+    # Normalise the header once and read cells by position, instead of
+    # building and re-keying a dict for every row.  Leading blank lines are
+    # skipped to find it.
+    header  = next((row for row in reader if any(cell.strip() for cell in row)), [])
+    header  = [h.strip().lower() for h in header]
+    if "name" not in header:
+        return []
+    i_name  = header.index("name")
+    i_lodge = header.index("lodge") if "lodge" in header else None
+    i_role  = header.index("role")  if "role"  in header else None
+
     entries = []
-    reader = csv.DictReader(io.StringIO(text.strip()))
     for row in reader:
-        r = {k.strip().lower(): v.strip() for k, v in row.items()}
-        name  = r.get("name", "").strip()
-        lodge = r.get("lodge", "").strip()
-        role  = r.get("role", "Participant").strip()
-        if name:
-            entries.append({"name": name, "lodge": lodge, "role": role})
+        if i_name >= len(row):
+            continue
+        name = row[i_name].strip()
+        if not name:
+            continue
+        lodge = row[i_lodge].strip() if i_lodge is not None and i_lodge < len(row) else ""
+        # Classify the role once here rather than in each generator.
+        staff = i_role is not None and i_role < len(row) and row[i_role].strip().lower() == "staff"
+        entries.append({"name": name, "lodge": lodge, "is_staff": staff})
     return entries
 
 
-def parse_plain(text):
-    entries = []
-    for line in text.strip().splitlines():
-        name = line.strip()
-        if name:
-            entries.append({"name": name, "lodge": "", "role": "Participant"})
-    return entries
+def parse_plain(lines):
+    """Parse one name per line from an iterable of lines (e.g. a text file)."""
+    return [{"name": name, "lodge": "", "is_staff": False}
+            for name in (line.strip() for line in lines)
+            if name]
 
 
 # ── Embedded HTML ─────────────────────────────────────────────────────────────
@@ -547,6 +740,11 @@ def parse_plain(text):
 _html_path = os.path.join(TEMPLATES_DIR, "index.html")
 INDEX_HTML  = open(_html_path, encoding="utf-8").read()
 
+# The page is static: encode it, and gzip it for clients that accept that,
+# once at import instead of on every hit.
+_INDEX_UTF8 = INDEX_HTML.encode("utf-8")
+_INDEX_GZ   = gzip.compress(_INDEX_UTF8, compresslevel=9)
+
 
 # ── Routes ────────────────────────────────────────────────────────────────────
 
@@ -582,36 +780,54 @@ def healthcheck():
 
 @app.route("/")
 def index():
-    return Response(INDEX_HTML, mimetype="text/html")
+    headers = {"Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding"}
+    if request.accept_encodings["gzip"]:
+        headers["Content-Encoding"] = "gzip"
+        return Response(_INDEX_GZ, mimetype="text/html", headers=headers)
+    return Response(_INDEX_UTF8, mimetype="text/html", headers=headers)
+
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    # Werkzeug rejects an oversize body from its Content-Length before any of
+    # it is read; answer in JSON so the page can show why.
+    limit_mb = app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)
+    return jsonify(error=f"Upload is too large (limit {limit_mb} MB)."), 413
 
 
 @app.route("/generate", methods=["POST"])
 def generate():
-    missing_templates = [
-        name for name, path in [("Staff.pdf", STAFF_PDF),
-                                  ("Participant.pdf", PARTICIPANT_PDF),
-                                  ("SLS_Name_Tent.pdf", TENT_PDF)]
-        if not os.path.exists(path)
-    ]
-    if missing_templates:
-        return jsonify(error=f"Template files missing: {', '.join(missing_templates)}"), 500
+    if _MISSING_TEMPLATES:
+        return jsonify(error=f"Template files missing: {', '.join(_MISSING_TEMPLATES)}"), 500
 
     section     = request.form.get("section", "").strip()
     output_type = request.form.get("output_type", "both")
     input_mode  = request.form.get("input_mode", "csv")
+    if output_type not in ("both", "certificates", "tents"):
+        return jsonify(error=f"Unknown output type: {output_type!r}."), 400
 
-    raw_text = ""
     uploaded = request.files.get("csv_file")
     if uploaded and uploaded.filename:
-        raw_text = uploaded.read().decode("utf-8-sig")
+        # Decode the upload incrementally as the parser pulls lines, rather
+        # than reading and decoding the whole file into one string first.
+        source = io.TextIOWrapper(uploaded.stream, encoding="utf-8-sig", newline="")
+        # Peek for the first non-blank line so an empty upload gets the same
+        # answer as empty pasted text; the parsers skip blank lines anyway.
+        try:
+            first = next((line for line in source if line.strip()), None)
+        except Exception as e:
+            return jsonify(error=f"Could not parse input: {e}"), 400
+        if first is None:
+            return jsonify(error="No input data provided."), 400
+        source = itertools.chain([first], source)
     else:
         raw_text = request.form.get("input_text", "")
-
-    if not raw_text.strip():
-        return jsonify(error="No input data provided."), 400
+        if not raw_text.strip():
+            return jsonify(error="No input data provided."), 400
+        source = io.StringIO(raw_text, newline="")
 
     try:
-        entries = parse_csv(raw_text) if input_mode == "csv" else parse_plain(raw_text)
+        entries = parse_csv(source) if input_mode == "csv" else parse_plain(source)
     except Exception as e:
         return jsonify(error=f"Could not parse input: {e}"), 400
 
@@ -619,35 +835,42 @@ def generate():
         return jsonify(error="No valid names found in the input."), 400
 
     try:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            cert_path = os.path.join(tmpdir, "Certificates.pdf")
-            tent_path = os.path.join(tmpdir, "Name_Tents.pdf")
-
-            if output_type in ("certificates", "both"):
-                generate_certificates(entries, section, cert_path)
-            if output_type in ("tents", "both"):
-                generate_name_tents(entries, tent_path)
-
-            if output_type == "certificates":
-                return send_file(cert_path, as_attachment=True,
-                                 download_name="Certificates.pdf",
-                                 mimetype="application/pdf")
-            if output_type == "tents":
-                return send_file(tent_path, as_attachment=True,
-                                 download_name="Name_Tents.pdf",
-                                 mimetype="application/pdf")
-
-            zip_path = os.path.join(tmpdir, "SLS_Documents.zip")
-            with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
-                zf.write(cert_path, "Certificates.pdf")
-                zf.write(tent_path, "Name_Tents.pdf")
-
-            return send_file(zip_path, as_attachment=True,
-                             download_name="SLS_Documents.zip",
-                             mimetype="application/zip")
+        cert_pdf = tent_pdf = None
+        if output_type in ("certificates", "both"):
+            cert_pdf = generate_certificates(entries, section)
+        if output_type in ("tents", "both"):
+            tent_pdf = generate_name_tents(entries)
+
+        # Serve straight from memory: send_file sets Content-Length from the
+        # BytesIO buffer, with no temp file to write, stat and read back.
+        # Each response is a one-shot download, so skip the conditional /
+        # Range handling as well and tell caches not to keep it.
+        if output_type == "certificates":
+            return send_file(io.BytesIO(cert_pdf), as_attachment=True,
+                             download_name="Certificates.pdf",
+                             mimetype="application/pdf", conditional=False,
+                             max_age=0)
+        if output_type == "tents":
+            return send_file(io.BytesIO(tent_pdf), as_attachment=True,
+                             download_name="Name_Tents.pdf",
+                             mimetype="application/pdf", conditional=False,
+                             max_age=0)
+
+        # The members are PDFs whose streams are already Flate-compressed, so
+        # store them rather than spend CPU on a second DEFLATE pass.  Writing to
+        # a seekable buffer keeps sizes in each local header (no data
+        # descriptors), which streaming unzip tools need for stored entries.
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:
+            zf.writestr("Certificates.pdf", cert_pdf)
+            zf.writestr("Name_Tents.pdf",   tent_pdf)
+        buf.seek(0)
+        return send_file(buf, as_attachment=True,
+                         download_name="SLS_Documents.zip",
+                         mimetype="application/zip", conditional=False,
+                         max_age=0)
 
     except Exception as e:
-        import traceback
         tb = traceback.format_exc()
         print(f"[SLS] Generation error:\n{tb}", flush=True)
         return jsonify(error=f"PDF generation failed: {e}", traceback=tb), 500
@@ -0,0 +1,22 @@
+"""
+Gunicorn settings for the SLS generator (gunicorn -c gunicorn.conf.py app:app).
+
+"""
+
+import os
+
+bind    = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+timeout = 60
+
+# /generate holds a worker for the whole PDF pipeline, so run threaded
+# workers to keep concurrent users from queueing behind one another.
+# Two workers fit the 512 MB free plan; os.cpu_count() reports the host's
+# cores inside a container, not the quota, so it is no guide here.
+# WEB_CONCURRENCY / GUNICORN_THREADS scale this per host without a code change.
+worker_class = "gthread"
+workers      = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads      = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Import app.py once in the master before forking: the template checks and
+# the Museo font bytes in FONTS are then shared copy-on-write by every worker.
+preload_app = True